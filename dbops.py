@@ -1,6 +1,7 @@
 import os
 import psycopg2
 from dotenv import load_dotenv
+from logic import Plant, Zombie
 
 # Load environment variables from .env file
 load_dotenv()
@@ -58,6 +59,33 @@ def get_all_zombies(conn):
         print(f"An error occurred while fetching zombies: {e}")
         return []
 
+def load_plants_and_zombies():
+    """
+    Load every plant and zombie from the database.
+    Returns two dictionaries of Plant and Zombie objects keyed by name.
+    Raises ConnectionError if the database cannot be reached.
+    """
+    conn = create_connection()
+    if conn is None:
+        raise ConnectionError("Failed to connect to the database")
+    plants_data = get_all_plants(conn)
+    zombies_data = get_all_zombies(conn)
+    close_connection(conn)
+
+    plants = {}
+    zombies = {}
+
+    for plant_data in plants_data:
+        plant_id, name, hp, dmg, dps, fire_rate, cost, cd = plant_data
+        sun_production = 25 if name == 'Sunflower' else 0
+        plants[name] = Plant(name=name, hp=hp, dmg=dmg, dps=dps, fire_rate=fire_rate, cost=cost, cd=cd, sun_production=sun_production)
+
+    for zombie_data in zombies_data:
+        zombie_id, name, hp, dmg, walk_speed, extra_health, *rest = zombie_data
+        zombies[name] = Zombie(name=name, hp=hp, dmg=dmg, walk_speed=walk_speed, extra_health=extra_health, lane=0, start_col=10)
+
+    return plants, zombies
+
 def close_connection(conn):
     """
     Close the connection to the PostgreSQL database.
@@ -0,0 +1,426 @@
+import argparse
+import asyncio
+import contextlib
+import os
+import socket
+import struct
+import sys
+import tempfile
+import threading
+from collections import deque
+import numpy as np
+from dbops import load_plants_and_zombies
+from environment import make_env
+from logic import *
+
+# Wire format (little-endian). Every message is a fixed header followed by `length` payload bytes.
+#   request:  opcode u8, request id u32, length u32
+#   response: status u8, request id u32, length u32
+# Payloads:
+#   SPEC   request: empty                      response: num_envs u32, obs_size u32, num_actions u32
+#   RESET  request: env indices u32[n]         response: obs f32[n, obs_size]
+#   STEP   request: env indices u32[n],        response: obs f32[n, obs_size], rewards f32[n], dones u8[n],
+#                   actions u32[n]                       sun_spent u32[n]
+# RESET starts each environment over from fresh plant copies. A request payload may hold at most
+# num_envs entries (num_envs * 8 bytes); a longer header gets an ERROR response and the connection
+# is closed, since the rest of the stream can no longer be trusted.
+# An ERROR response carries a UTF-8 message. Responses come back in request order, so a client
+# may pipeline requests before reading. The server keeps reading requests while earlier responses
+# are still being written, and EnvClient keeps at most MAX_IN_FLIGHT requests outstanding (reading
+# responses ahead into a buffer if needed), which bounds how much the server has to queue.
+REQUEST = struct.Struct('<BII')
+RESPONSE = struct.Struct('<BII')
+SPEC = struct.Struct('<III')
+
+MAX_IN_FLIGHT = 64
+
+OP_SPEC = 0
+OP_RESET = 1
+OP_STEP = 2
+
+STATUS_OK = 0
+STATUS_ERROR = 1
+
+
+class EnvServerError(Exception):
+    pass
+
+
+class EnvServer:
+    """Host a batch of PvZEnv instances and step them on behalf of remote clients."""
+
+    def __init__(self, plants, zombies, num_envs):
+        self.plants = plants
+        self.zombies = zombies
+        self.envs = [make_env(plants, zombies) for _ in range(num_envs)]
+        self.max_payload = num_envs * 8  # A STEP entry for every environment
+        self.obs_size = self.envs[0].observation_space.shape[0]
+        self.num_actions = self.envs[0].action_space.n
+
+    def _indices(self, payload, count):
+        indices = np.frombuffer(payload, dtype='<u4', count=count)
+        if indices.size and indices.max() >= len(self.envs):
+            raise EnvServerError(f"Environment index {indices.max()} out of range for {len(self.envs)} environments")
+        return indices
+
+    def spec(self, payload):
+        return SPEC.pack(len(self.envs), self.obs_size, self.num_actions)
+
+    def reset(self, payload):
+        if len(payload) % 4:
+            raise EnvServerError(f"RESET payload of {len(payload)} bytes is not a whole number of u32 indices")
+        indices = self._indices(payload, len(payload) // 4)
+        obs = np.empty((len(indices), self.obs_size), dtype='<f4')
+        for i, index in enumerate(indices):
+            # PvZEnv.reset keeps its Plant objects, and with them the last episode's cooldowns and sun timers
+            self.envs[index] = make_env(self.plants, self.zombies)
+            obs[i] = self.envs[index].reset()
+        return obs.tobytes()
+
+    def step(self, payload):
+        if len(payload) % 8:
+            raise EnvServerError(f"STEP payload of {len(payload)} bytes is not a whole number of (index, action) pairs")
+        n = len(payload) // 8
+        indices = self._indices(payload, n)
+        actions = np.frombuffer(payload, dtype='<u4', count=n, offset=n * 4)
+        if actions.size and actions.max() >= self.num_actions:
+            raise EnvServerError(f"Action {actions.max()} out of range for {self.num_actions} actions")
+        obs = np.empty((n, self.obs_size), dtype='<f4')
+        rewards = np.empty(n, dtype='<f4')
+        dones = np.empty(n, dtype=np.uint8)
+        sun_spent = np.empty(n, dtype='<u4')
+        for i, (index, action) in enumerate(zip(indices, actions)):
+            obs[i], rewards[i], dones[i], info = self.envs[index].step(int(action))
+            sun_spent[i] = info['sun_spent']
+        return obs.tobytes() + rewards.tobytes() + dones.tobytes() + sun_spent.tobytes()
+
+    def dispatch(self, opcode, payload):
+        handlers = {OP_SPEC: self.spec, OP_RESET: self.reset, OP_STEP: self.step}
+        if opcode not in handlers:
+            raise EnvServerError(f"Unknown opcode {opcode}")
+        return handlers[opcode](payload)
+
+    async def _write_responses(self, responses, writer):
+        """Write queued responses in order; a None entry means the reader has finished."""
+        while True:
+            response = await responses.get()
+            if response is None:
+                return
+            writer.write(response)
+            await writer.drain()
+
+    async def handle_connection(self, reader, writer):
+        """Serve requests from one client in order until it disconnects."""
+        # Writing runs in its own task so a slow-draining client never stops us reading its next requests
+        responses = asyncio.Queue()
+        writer_task = asyncio.create_task(self._write_responses(responses, writer))
+        try:
+            while True:
+                opcode, request_id, length = REQUEST.unpack(await reader.readexactly(REQUEST.size))
+                if length > self.max_payload:
+                    body = f"Payload of {length} bytes exceeds the {self.max_payload}-byte limit".encode()
+                    responses.put_nowait(RESPONSE.pack(STATUS_ERROR, request_id, len(body)) + body)
+                    break  # We can't skip an untrusted length, so drop the connection
+                payload = await reader.readexactly(length)
+                try:
+                    status, body = STATUS_OK, self.dispatch(opcode, payload)
+                except Exception as e:
+                    status, body = STATUS_ERROR, f"{type(e).__name__}: {e}".encode()
+                responses.put_nowait(RESPONSE.pack(status, request_id, len(body)) + body)
+                await asyncio.sleep(0)  # Let the writer flush between requests that were already buffered
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass  # Client went away
+        finally:
+            responses.put_nowait(None)
+            try:
+                await writer_task
+            except ConnectionError:
+                pass
+            writer.close()
+
+    async def start(self, host='127.0.0.1', port=5555, unix_path=None):
+        """Start listening on a Unix socket if a path is given, otherwise on TCP, and return the asyncio server."""
+        if unix_path is not None:
+            return await asyncio.start_unix_server(self.handle_connection, path=unix_path)
+        return await asyncio.start_server(self.handle_connection, host=host, port=port)
+
+    async def serve(self, host='127.0.0.1', port=5555, unix_path=None):
+        """Listen until cancelled."""
+        server = await self.start(host=host, port=port, unix_path=unix_path)
+        async with server:
+            await server.serve_forever()
+
+
+class EnvClient:
+    """
+    Blocking client for one EnvServer at 'host:port' or 'unix:/path'.
+    submit_reset/submit_step send a request without waiting, and result() reads the oldest outstanding one,
+    so a batch can be pipelined; reset/step do both in one call. Once max_in_flight requests are outstanding,
+    submitting another first reads the oldest response into a buffer.
+    """
+
+    def __init__(self, address, max_in_flight=MAX_IN_FLIGHT):
+        if address.startswith('unix:'):
+            self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            self.sock.connect(address[len('unix:'):])
+        else:
+            host, port = address.rsplit(':', 1)
+            self.sock = socket.create_connection((host, int(port)))
+            self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.max_in_flight = max_in_flight
+        self.next_request_id = 0
+        self.pending = deque()  # (request id, opcode, batch size) of requests the server has not answered yet
+        self.ready = deque()  # (opcode, batch size, status, body) of responses read ahead of result()
+        self.num_envs, self.obs_size, self.num_actions = SPEC.unpack(self._call(OP_SPEC, b'', 0))
+
+    def _submit(self, opcode, payload, n):
+        while len(self.pending) >= self.max_in_flight:
+            self.ready.append(self._read_response())
+        request_id = self.next_request_id
+        self.next_request_id = (self.next_request_id + 1) % 2 ** 32
+        self.sock.sendall(REQUEST.pack(opcode, request_id, len(payload)) + payload)
+        self.pending.append((request_id, opcode, n))
+        return request_id
+
+    def _recv_exactly(self, size):
+        buf = bytearray(size)
+        view = memoryview(buf)
+        while view:
+            received = self.sock.recv_into(view)
+            if received == 0:
+                raise EnvServerError("Connection closed by server")
+            view = view[received:]
+        return bytes(buf)
+
+    def _read_response(self):
+        expected_id, opcode, n = self.pending.popleft()
+        status, request_id, length = RESPONSE.unpack(self._recv_exactly(RESPONSE.size))
+        body = self._recv_exactly(length)
+        if request_id != expected_id:
+            raise EnvServerError(f"Expected response {expected_id}, got {request_id}")
+        return opcode, n, status, body
+
+    def _result(self):
+        opcode, n, status, body = self.ready.popleft() if self.ready else self._read_response()
+        if status != STATUS_OK:
+            raise EnvServerError(body.decode())
+        return opcode, n, body
+
+    def _call(self, opcode, payload, n):
+        self._submit(opcode, payload, n)
+        return self._result()[2]
+
+    def submit_reset(self, indices):
+        indices = np.asarray(indices, dtype='<u4')
+        return self._submit(OP_RESET, indices.tobytes(), len(indices))
+
+    def submit_step(self, indices, actions):
+        indices = np.asarray(indices, dtype='<u4')
+        actions = np.asarray(actions, dtype='<u4')
+        if indices.shape != actions.shape:
+            raise ValueError("indices and actions must have the same length")
+        return self._submit(OP_STEP, indices.tobytes() + actions.tobytes(), len(indices))
+
+    def result(self):
+        """Return the oldest outstanding result: obs for a reset, (obs, rewards, dones, sun_spent) for a step."""
+        opcode, n, body = self._result()
+        obs = np.frombuffer(body, dtype='<f4', count=n * self.obs_size).reshape(n, self.obs_size)
+        if opcode == OP_RESET:
+            return obs
+        offset = obs.nbytes
+        rewards = np.frombuffer(body, dtype='<f4', count=n, offset=offset)
+        offset += rewards.nbytes
+        dones = np.frombuffer(body, dtype=np.uint8, count=n, offset=offset).astype(bool)
+        sun_spent = np.frombuffer(body, dtype='<u4', count=n, offset=offset + n)
+        return obs, rewards, dones, sun_spent
+
+    def reset(self, indices=None):
+        """Reset the given environments (all by default) and return their observations."""
+        self.submit_reset(range(self.num_envs) if indices is None else indices)
+        return self.result()
+
+    def step(self, actions, indices=None):
+        """Step the given environments (all by default) and return (obs, rewards, dones, sun_spent)."""
+        self.submit_step(range(self.num_envs) if indices is None else indices, actions)
+        return self.result()
+
+    def close(self):
+        self.sock.close()
+
+
+class EnvClientPool:
+    """Treat several EnvServers, possibly on different hosts, as one batch of environments."""
+
+    def __init__(self, addresses):
+        self.clients = [EnvClient(address) for address in addresses]
+        self.num_envs = sum(client.num_envs for client in self.clients)
+        self.obs_size = self.clients[0].obs_size
+        self.num_actions = self.clients[0].num_actions
+
+    def _split(self, values):
+        start = 0
+        for client in self.clients:
+            yield client, values[start:start + client.num_envs]
+            start += client.num_envs
+
+    def reset(self):
+        """Reset every environment on every server and return the stacked observations."""
+        for client in self.clients:
+            client.submit_reset(range(client.num_envs))
+        return np.concatenate([client.result() for client in self.clients])
+
+    def step(self, actions):
+        """Step every environment with one action each; all servers work on their share concurrently."""
+        actions = np.asarray(actions)
+        # Check before sending anything, or earlier clients would be left with an unread response
+        if len(actions) != self.num_envs:
+            raise ValueError(f"Expected {self.num_envs} actions, got {len(actions)}")
+        for client, client_actions in self._split(actions):
+            client.submit_step(range(client.num_envs), client_actions)
+        results = [client.result() for client in self.clients]
+        return tuple(np.concatenate(parts) for parts in zip(*results))
+
+    def close(self):
+        for client in self.clients:
+            client.close()
+
+
+def _check(condition, message):
+    """Like assert, but still checked under python -O."""
+    if not condition:
+        raise AssertionError(message)
+
+
+def _expect_error(request, error, message):
+    """Run request and raise AssertionError unless it raises the given error."""
+    try:
+        request()
+    except error:
+        return
+    raise AssertionError(message)
+
+
+def self_test(plants, zombies, num_envs=4):
+    """
+    Check the protocol over loopback: one TCP and one Unix-socket server behind an EnvClientPool,
+    pipelined past MAX_IN_FLIGHT, fresh plants on reset, plus error responses.
+    Raises AssertionError on the first failure.
+    """
+    loop = asyncio.new_event_loop()
+    thread = threading.Thread(target=loop.run_forever, daemon=True)
+    thread.start()
+
+    def start(**kwargs):
+        server = EnvServer(plants, zombies, num_envs)
+        return asyncio.run_coroutine_threadsafe(server.start(**kwargs), loop).result()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        unix_path = os.path.join(tmp, 'pvz.sock')
+        servers = [start(host='127.0.0.1', port=0), start(unix_path=unix_path)]
+        port = servers[0].sockets[0].getsockname()[1]
+        addresses = [f"127.0.0.1:{port}", f"unix:{unix_path}"]
+        pool = EnvClientPool(addresses)
+        try:
+            obs = pool.reset()
+            _check(obs.shape == (2 * num_envs, pool.obs_size), f"reset returned shape {obs.shape}")
+
+            # Pipeline well past the in-flight cap, then read everything back in order
+            client = pool.clients[0]
+            skip = pool.num_actions - 1
+            for _ in range(3 * MAX_IN_FLIGHT):
+                client.submit_step(range(num_envs), [skip] * num_envs)
+            for _ in range(3 * MAX_IN_FLIGHT):
+                obs, rewards, dones, sun_spent = client.result()
+                _check(obs.shape == (num_envs, pool.obs_size), f"pipelined step returned shape {obs.shape}")
+                _check(rewards.shape == dones.shape == sun_spent.shape == (num_envs,),
+                       "pipelined step returned mismatched rewards, dones or sun_spent")
+
+            obs, rewards, dones, sun_spent = pool.step(np.random.randint(0, pool.num_actions, pool.num_envs))
+            _check(obs.shape == (2 * num_envs, pool.obs_size), f"pool step returned shape {obs.shape}")
+            _check(rewards.shape == dones.shape == sun_spent.shape == (2 * num_envs,),
+                   "pool step returned mismatched rewards, dones or sun_spent")
+
+            # Placing the first plant after a reset costs the same as in the episode before it
+            client.reset([0])
+            for _ in range(3 * MAX_IN_FLIGHT):
+                client.step([skip], indices=[0])
+            spent_before = client.step([0], indices=[0])[3][0]
+            client.reset([0])
+            spent_after = client.step([0], indices=[0])[3][0]
+            _check(spent_after == spent_before, f"reset kept plant timers: spent {spent_after}, expected {spent_before}")
+
+            # A wrong action count is rejected before anything is sent
+            _expect_error(lambda: pool.step([skip]), ValueError, "pool.step accepted the wrong number of actions")
+            _check(all(not c.pending and not c.ready for c in pool.clients), "pool.step left requests outstanding")
+
+            # Server-side errors come back as responses and leave the connection usable
+            _expect_error(lambda: client.step([0], indices=[num_envs]), EnvServerError,
+                          "server accepted an out-of-range environment index")
+            _expect_error(lambda: client.step([pool.num_actions], indices=[0]), EnvServerError,
+                          "server accepted an out-of-range action")
+            client._submit(OP_RESET, b'\0' * 5, 1)
+            _expect_error(client.result, EnvServerError, "server accepted a RESET payload of 5 bytes")
+            _check(client.reset([0]).shape == (1, pool.obs_size), "connection unusable after an error response")
+
+            # An oversized header is answered with an error before the connection is dropped
+            raw = EnvClient(addresses[0])
+            try:
+                request_id = raw.next_request_id
+                raw.sock.sendall(REQUEST.pack(OP_STEP, request_id, 2 ** 31))
+                raw.pending.append((request_id, OP_STEP, 0))
+                _expect_error(raw.result, EnvServerError, "server accepted a 2 GiB payload length")
+            finally:
+                raw.close()
+        finally:
+            pool.close()
+
+            async def shutdown():
+                for server in servers:
+                    server.close()
+                # Let the connection handlers see the closed sockets and finish
+                handlers = asyncio.all_tasks() - {asyncio.current_task()}
+                if handlers:
+                    await asyncio.wait(handlers, timeout=5)
+
+            asyncio.run_coroutine_threadsafe(shutdown(), loop).result()
+            loop.call_soon_threadsafe(loop.stop)
+            thread.join()
+            loop.close()
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Serve a batch of PvZ environments over TCP or a Unix socket.")
+    parser.add_argument("--num-envs", type=int, default=16, help="Number of environments hosted by this server")
+    parser.add_argument("--host", default='127.0.0.1', help="TCP address to listen on")
+    parser.add_argument("--port", type=int, default=5555, help="TCP port to listen on")
+    parser.add_argument("--unix", help="Listen on this Unix socket path instead of TCP")
+    parser.add_argument("--selftest", action='store_true', help="Run a loopback check of the protocol and exit")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    try:
+        plants, zombies = load_plants_and_zombies()
+    except ConnectionError as e:
+        print(f"{e}. Exiting...")
+        return
+
+    # The game logic prints every move, which a headless server has no use for
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        if args.selftest:
+            self_test(plants, zombies)
+            print("Self-test passed", file=sys.stderr)
+            return
+
+        server = EnvServer(plants, zombies, args.num_envs)
+        where = args.unix if args.unix else f"{args.host}:{args.port}"
+        print(f"Serving {args.num_envs} environments on {where}", file=sys.stderr)
+        try:
+            asyncio.run(server.serve(host=args.host, port=args.port, unix_path=args.unix))
+        except KeyboardInterrupt:
+            pass
+
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,18 @@
+import copy
 import gym
 from gym import spaces
 import numpy as np
 from logic import *
 
 
+def make_env(plants, zombies):
+    """Create a PvZEnv with its own copies of the plants.
+
+    Plants carry cooldown and sun timers, so environments that share Plant objects would share them too.
+    """
+    return PvZEnv(copy.deepcopy(plants), zombies)
+
+
 class PvZEnv(gym.Env):
     """Custom Environment that follows gym interface"""
     metadata = {'render.modes': ['human']}
@@ -46,9 +55,11 @@ class PvZEnv(gym.Env):
 
             plant = self.plants[plant_index]
             success = buy_and_place(self.game, lane=lane, col=col, plant=plant)
+            sun_spent = plant.cost if success else 0
         else:
             # Action to skip planting and advance time
             success = True
+            sun_spent = 0
 
         # Always advance time by 1 second after an action
         self.game.advance_time(1)
@@ -67,7 +78,7 @@ class PvZEnv(gym.Env):
         reward = self._calculate_reward()
         done = self._is_done()
 
-        return self._get_obs(), reward, done, {}
+        return self._get_obs(), reward, done, {'sun_spent': sun_spent}
 
     def render(self, mode='human'):
         """Render the game state"""
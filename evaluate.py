@@ -0,0 +1,146 @@
+import argparse
+import multiprocessing
+import os
+import random
+import sys
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from dbops import load_plants_and_zombies
+from logic import *
+
+METRICS = ('survival_time', 'sun_spent', 'final_sun', 'lawnmower_lanes')
+Z_95 = 1.96  # Normal approximation for a 95% confidence interval
+
+# Per-process state set up once by _init_worker
+_env_args = None
+_agent = None
+
+
+def _init_worker(checkpoint, plants, zombies):
+    """Build a greedy agent once per worker process so each seed only pays for the episode itself."""
+    global _env_args, _agent
+    sys.stdout = open(os.devnull, 'w')  # The game logic prints every move
+    import tensorflow as tf
+    tf.config.threading.set_intra_op_parallelism_threads(1)  # One process per core, not one pool per process
+    tf.config.threading.set_inter_op_parallelism_threads(1)
+    from agent import DQNAgent
+    from environment import PvZEnv
+
+    env = PvZEnv(plants, zombies)
+    _agent = DQNAgent(env.observation_space.shape[0], env.action_space.n)
+    _agent.load(checkpoint)
+    _env_args = (plants, zombies)
+
+
+def run_episode(seed, max_steps=500):
+    """Play one greedy episode with a fixed seed and return its metrics."""
+    from environment import make_env
+
+    random.seed(seed)
+    np.random.seed(seed)
+    env = make_env(*_env_args)
+    state_size = env.observation_space.shape[0]
+    state = np.reshape(env.reset(), [1, state_size])
+
+    sun_spent = 0
+    lawnmower_lanes = set()  # Lanes where a zombie reached the lawnmower column (col1)
+    survival_time = max_steps
+    for time in range(max_steps):
+        # Always exploit; calling the model directly is much cheaper than predict() on a single state
+        action = np.argmax(_agent.model(state, training=False)[0])
+        next_state, reward, done, info = env.step(action)
+        sun_spent += info['sun_spent']
+        for lane in range(env.lanes):
+            if isinstance(env.game.field_objects[lane][1], Zombie):
+                lawnmower_lanes.add(lane)
+        state = np.reshape(next_state, [1, state_size])
+        if done:
+            survival_time = time + 1  # Count steps played, as a full survival counts max_steps
+            break
+
+    return {
+        'survival_time': survival_time,
+        'sun_spent': sun_spent,
+        'final_sun': env.game.sun,
+        'lawnmower_lanes': len(lawnmower_lanes),
+    }
+
+
+def summarize(results):
+    """Return {metric: (mean, half_width)} with a 95% confidence interval for each metric."""
+    summary = {}
+    for metric in METRICS:
+        values = np.array([r[metric] for r in results], dtype=np.float64)
+        half_width = Z_95 * values.std(ddof=1) / np.sqrt(len(values)) if len(values) > 1 else float('inf')
+        summary[metric] = (values.mean(), half_width)
+    return summary
+
+
+def is_tight(summary, tolerance):
+    """Check if every interval's half-width is within tolerance of its mean (floored at 1 for near-zero means)."""
+    return all(half_width <= tolerance * max(abs(mean), 1.0) for mean, half_width in summary.values())
+
+
+def evaluate(checkpoint, plants, zombies, seeds, workers, min_seeds=50, tolerance=0.05, max_steps=500):
+    """
+    Evaluate a checkpoint greedily over the given seeds in a process pool.
+    Seeds are played in batches and evaluation stops early once all confidence intervals are tight.
+    Returns the summary and the number of seeds played.
+    """
+    if len(seeds) < 2:
+        raise ValueError("At least 2 seeds are needed for a confidence interval")
+    results = []
+    batch_size = workers * 4
+    # Spawn rather than fork: TensorFlow does not survive being forked after import
+    context = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context, initializer=_init_worker,
+                             initargs=(checkpoint, plants, zombies)) as executor:
+        for start in range(0, len(seeds), batch_size):
+            batch = seeds[start:start + batch_size]
+            results.extend(executor.map(run_episode, batch, [max_steps] * len(batch)))
+            summary = summarize(results)
+            if len(results) >= min_seeds and is_tight(summary, tolerance):
+                break
+    return summary, len(results)
+
+
+def print_summary(checkpoint, summary, num_seeds):
+    print(f"{checkpoint} ({num_seeds} seeds)")
+    for metric, (mean, half_width) in summary.items():
+        print(f"  {metric:<16} {mean:10.2f} +/- {half_width:.2f}")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Evaluate saved DQNAgent checkpoints greedily over fixed seeds.")
+    parser.add_argument("checkpoints", nargs='+', help="Model weight files, e.g. models/dqn_model_episode_50.h5")
+    parser.add_argument("--seeds", type=int, default=500, help="Maximum number of seeds to play per checkpoint")
+    parser.add_argument("--seed-start", type=int, default=0, help="First seed; every checkpoint sees the same seeds")
+    parser.add_argument("--min-seeds", type=int, default=50, help="Seeds to play before early stopping is allowed")
+    parser.add_argument("--tolerance", type=float, default=0.05,
+                        help="Stop once every 95%% interval half-width is within this fraction of its mean")
+    parser.add_argument("--max-steps", type=int, default=500, help="Maximum number of time steps per episode")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="Number of worker processes")
+    args = parser.parse_args()
+    if args.seeds < 2:
+        parser.error("--seeds must be at least 2 for a confidence interval")
+    return args
+
+
+def main():
+    args = parse_args()
+
+    try:
+        plants, zombies = load_plants_and_zombies()
+    except ConnectionError as e:
+        print(f"{e}. Exiting...")
+        return
+
+    seeds = list(range(args.seed_start, args.seed_start + args.seeds))
+    for checkpoint in args.checkpoints:
+        summary, num_seeds = evaluate(checkpoint, plants, zombies, seeds, args.workers, min_seeds=args.min_seeds,
+                                      tolerance=args.tolerance, max_steps=args.max_steps)
+        print_summary(checkpoint, summary, num_seeds)
+
+
+if __name__ == "__main__":
+    main()
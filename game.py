@@ -1,13 +1,20 @@
+import argparse
+import asyncio
+import contextlib
+import io
 import random
-from logic import Game, Plant, Zombie, buy_and_place, print_field, update_sun_production, move_zombies, spawn_zombie
-from dbops import create_connection, get_all_plants, get_all_zombies, close_connection
+import sys
+import threading
+import numpy as np
+from logic import Game, Zombie, buy_and_place, print_field, update_sun_production, move_zombies, spawn_zombie
+from dbops import load_plants_and_zombies
 
 
 class GameOverException(Exception):
     pass
 
 
-def _weighted_random_zombie_choice(self, zombies):
+def weighted_random_zombie_choice(zombies):
     """Select a zombie weighted by their health, favoring those with lower health."""
     total_health = sum(z.hp for z in zombies.values())
     if total_health == 0:
@@ -49,135 +56,250 @@ def can_spawn_zombie_in_lane(game, lane):
     return zombie_count < 4
 
 
-def prompt_for_plant_placement(plants):
-    """ Prompt the user to place plants and return the chosen plant, lane, and column. """
+def print_plant_menu(game, plants):
+    """ Print the available plants and how to enter a placement while the clock is running. """
     print("\nAvailable plants:")
     for i, plant_name in enumerate(plants.keys()):
         print(f"{i + 1}. {plant_name}")
-    print(f"{len(plants) + 1}. Skip planting and advance time")
+    print(f"Enter '<plant number> <lane 1-{game.lanes}> <column 3-{game.cols}>' at any time to place a plant.")
 
-    plant_choice = int(input("Select a plant by number: ")) - 1
 
-    if plant_choice == len(plants):
-        return None, None, None  # Indicate that the player chose to skip planting
+def check_placement(game, lane, col):
+    """ Raise ValueError unless the 0-based lane and column are inside the plantable part of the field. """
+    if not 0 <= lane < game.lanes:
+        raise ValueError(f"Lane must be between 1 and {game.lanes}, got {lane + 1}")
+    if not 2 <= col < game.cols:  # Columns start from 2 due to home and lawnmower columns
+        raise ValueError(f"Column must be between 3 and {game.cols}, got {col + 1}")
 
-    plant_name = list(plants.keys())[plant_choice]
-
-    lane = int(input(f"Enter lane (1-{lanes}): ")) - 1
-    col = int(input(f"Enter column (3-{cols}): ")) - 1  # Columns start from 2 due to home and lawnmower columns
 
+def parse_plant_placement(game, line, plants):
+    """ Parse a '<plant number> <lane> <column>' line and return the chosen plant, lane, and column. """
+    plant_choice, lane, col = (int(part) - 1 for part in line.split())
+    if not 0 <= plant_choice < len(plants):
+        raise ValueError(f"Unknown plant number {plant_choice + 1}")
+    check_placement(game, lane, col)
+    plant_name = list(plants.keys())[plant_choice]
     return plant_name, lane, col
 
 
-def main():
-    # Create a connection to the database
-    conn = create_connection()
-
-    if conn is None:
-        print("Failed to connect to the database. Exiting...")
-        return
+def load_script(game, path, plants):
+    """
+    Load a scripted player from a text file.
+    Each non-empty line is 'time,plant name,lane,column' with 1-based lane and column; '#' starts a comment.
+    Returns a list of (time, plant_name, lane, col) tuples sorted by time, or raises ValueError on a bad line.
+    """
+    moves = []
+    with open(path) as f:
+        for line_number, line in enumerate(f, start=1):
+            line = line.split('#', 1)[0].strip()
+            if not line:
+                continue
+            try:
+                time, plant_name, lane, col = (part.strip() for part in line.split(','))
+                if plant_name not in plants:
+                    raise ValueError(f"Unknown plant {plant_name!r}, expected one of {', '.join(plants)}")
+                time, lane, col = int(time), int(lane) - 1, int(col) - 1
+                check_placement(game, lane, col)
+            except ValueError as e:
+                raise ValueError(f"{path}, line {line_number}: {e}") from None
+            moves.append((time, plant_name, lane, col))
+    return sorted(moves, key=lambda move: move[0])
+
+
+class GameClock:
+    """Advance a Game at a fixed real-time rate, independently of whoever is placing plants."""
+
+    def __init__(self, game, zombies, speed=1.0, duration=60, quiet=False):
+        if speed <= 0:
+            raise ValueError("speed must be positive")
+        self.game = game
+        self.zombies = zombies
+        self.speed = speed  # Game seconds simulated per wall-clock second
+        self.duration = duration  # Total simulation time in game seconds
+        self.quiet = quiet  # Swallow the per-tick field and status output
+        self.lawnmowers = [True] * game.lanes  # Lawn mowers are initially available for all lanes
+        self.moves = asyncio.Queue()  # (plant, lane, col) placements waiting for the next tick
+        self.next_sun_drop_time = random.randint(8, 12)  # Schedule the first random sun drop
+        self._ticked = asyncio.Condition()
+
+    async def wait_until(self, game_time):
+        """Wait until the game clock has reached the given game time."""
+        async with self._ticked:
+            await self._ticked.wait_for(lambda: self.game.get_game_time() >= game_time)
+
+    def apply_moves(self):
+        """Place every plant that was queued since the last tick."""
+        while not self.moves.empty():
+            plant, lane, col = self.moves.get_nowait()
+            buy_and_place(self.game, lane=lane, col=col, plant=plant)
+            print_field(self.game)
+
+    def tick(self):
+        """Advance the game by one second; raises GameOverException when the house is reached."""
+        game = self.game
+        elapsed_time = game.get_game_time()
+
+        # Advance time by 1 second
+        game.advance_time(1)
+
+        # Random sun drop
+        if elapsed_time >= self.next_sun_drop_time:
+            spawn_random_sun(game)
+            self.next_sun_drop_time += random.randint(8, 12)  # Schedule the next sun drop
+
+        # Spawn zombies only after 18 seconds have passed
+        if game.get_game_time() > 18:
+            if random.randint(1, 10) > 8:  # 20% chance to spawn a zombie each second
+                # Choose a zombie weighted by lower health
+                zombie = weighted_random_zombie_choice(self.zombies)
+                lane = random.randint(0, game.lanes - 1)
+                if can_spawn_zombie_in_lane(game, lane):
+                    spawn_zombie(game, name=zombie.name, hp=zombie.hp, dmg=zombie.dmg,
+                                 walk_speed=zombie.walk_speed, extra_health=zombie.extra_health)
+                else:
+                    print(f"Lane {lane + 1} is full and cannot spawn more zombies.")
+
+        # Move zombies
+        move_zombies(game)
+
+        # Generate sun from Sunflower and update the game state
+        update_sun_production(game)
+
+        # Check for lawnmower activation or game over
+        for lane in range(game.lanes):
+            if isinstance(game.field_objects[lane][1], Zombie):  # Check if a zombie is in col1
+                if self.lawnmowers[lane]:
+                    activate_lawnmower(game, lane, self.lawnmowers)
+                    game.field_objects[lane][1] = None  # Remove the zombie in col1 after lawnmower activation
+                else:
+                    raise GameOverException(
+                        f"Game Over! A zombie reached the lawnmower column (col1) in lane {lane + 1} and no lawnmower is available.")
+
+            elif isinstance(game.field_objects[lane][0], Zombie):  # Check if a zombie is in col0 (home)
+                raise GameOverException(f"Game Over! A zombie reached the home column in lane {lane + 1}.")
+
+        # Print game status every second
+        print(f"Time: {game.get_game_time()} seconds")
+        print(f"Current sun: {game.sun}")
+        print_field(game)
+
+    async def run(self):
+        """Tick until the duration is reached or the game is lost, without drifting from the fixed rate."""
+        loop = asyncio.get_running_loop()
+        interval = 1.0 / self.speed
+        next_tick = loop.time()
+        while self.game.get_game_time() < self.duration:
+            next_tick += interval
+            await asyncio.sleep(max(0.0, next_tick - loop.time()))
+            with contextlib.redirect_stdout(io.StringIO()) if self.quiet else contextlib.nullcontext():
+                self.apply_moves()
+                self.tick()
+            async with self._ticked:
+                self._ticked.notify_all()
+
+
+async def human_player(clock, plants):
+    """Read placements from stdin on a daemon thread so the clock keeps running while the player thinks."""
+    loop = asyncio.get_running_loop()
+    lines = asyncio.Queue()
+
+    def read_lines():
+        try:
+            for line in sys.stdin:
+                loop.call_soon_threadsafe(lines.put_nowait, line)
+            loop.call_soon_threadsafe(lines.put_nowait, None)
+        except RuntimeError:
+            pass  # The game is over and its event loop is closed
+
+    # A daemon thread (rather than run_in_executor) so a pending input() never blocks shutdown
+    threading.Thread(target=read_lines, daemon=True).start()
+    print_plant_menu(clock.game, plants)
+    while True:
+        line = await lines.get()
+        if line is None:
+            return  # stdin closed, let the clock run on its own
+        if not line.strip():
+            continue
+        try:
+            plant_name, lane, col = parse_plant_placement(clock.game, line, plants)
+        except ValueError as e:
+            print(f"Invalid placement {line.strip()!r}: {e}")
+            continue
+        await clock.moves.put((plants[plant_name], lane, col))
+
+
+async def scripted_player(clock, plants, script):
+    """Replay (time, plant_name, lane, col) moves headlessly; each move is applied on the tick after its time."""
+    for time, plant_name, lane, col in script:
+        await clock.wait_until(time)
+        await clock.moves.put((plants[plant_name], lane, col))
+
+
+async def play(clock, player):
+    """Run the clock and a player coroutine together until the clock stops."""
+    player_task = asyncio.create_task(player)
+    try:
+        await clock.run()
+    except GameOverException as e:
+        print(e)
+    finally:
+        player_task.cancel()
+        try:
+            await player_task
+        except asyncio.CancelledError:
+            pass
 
-    # Fetch all plants and zombies from the database
-    plants_data = get_all_plants(conn)
-    zombies_data = get_all_zombies(conn)
 
-    # Create a dictionary to store Plant and Zombie objects by name
-    plants = {}
-    zombies = {}
+def parse_args():
+    parser = argparse.ArgumentParser(description="Play PvZ in real time against a fixed-rate game clock.")
+    parser.add_argument("--speed", type=float, default=1.0,
+                        help="Game seconds simulated per wall-clock second (default: 1.0)")
+    parser.add_argument("--duration", type=int, default=60, help="Total simulation time in game seconds")
+    parser.add_argument("--script", help="Run headless, replaying 'time,plant name,lane,column' lines from this file; "
+                                         "only the final result is printed")
+    return parser.parse_args()
 
-    for plant_data in plants_data:
-        plant_id, name, hp, dmg, dps, fire_rate, cost, cd = plant_data
-        sun_production = 25 if name == 'Sunflower' else 0
-        plants[name] = Plant(name=name, hp=hp, dmg=dmg, dps=dps, fire_rate=fire_rate, cost=cost, cd=cd,
-                             sun_production=sun_production)
 
-    for zombie_data in zombies_data:
-        zombie_id, name, hp, dmg, walk_speed, extra_health, *rest = zombie_data
-        zombies[name] = Zombie(name=name, hp=hp, dmg=dmg, walk_speed=walk_speed, extra_health=extra_health, lane=0,
-                               start_col=10)
+def main():
+    args = parse_args()
 
-    # Close the database connection
-    close_connection(conn)
+    # Fetch all plants and zombies from the database
+    try:
+        plants, zombies = load_plants_and_zombies()
+    except ConnectionError as e:
+        print(f"{e}. Exiting...")
+        return
 
     # Game setup
-    global lanes, cols  # Making these global for the input function
     lanes = 5
     cols = 11  # Extend the game field to include home (col0) and lawnmowers (col1)
     sun = 150  # Starting sun points
     game = Game(world=1, lanes=lanes, cols=cols, sun=sun)
-    lawnmowers = [True] * lanes  # Lawn mowers are initially available for all lanes
-
-    # Display initial field
-    print("Initial Game Field:")
-    print_field(game)
-
-    # Main game loop
-    total_simulation_time = 60  # Total simulation time in seconds
-    elapsed_time = 0
 
-    next_sun_drop_time = random.randint(8, 12)  # Schedule the first random sun drop
-
-    try:
-        while elapsed_time < total_simulation_time:
-            # Ask the user if they want to place a plant
-            while True:
-                plant_name, lane, col = prompt_for_plant_placement(plants)
-                if plant_name is None:
-                    break  # Player chose to skip planting
-
-                success = buy_and_place(game, lane=lane, col=col, plant=plants[plant_name])
-                print_field(game)
-
-                if success:
-                    break  # Exit the loop if the plant was successfully placed
-
-            # Advance time by 1 second
-            game.advance_time(1)
-
-            # Random sun drop
-            if elapsed_time >= next_sun_drop_time:
-                spawn_random_sun(game)
-                next_sun_drop_time += random.randint(8, 12)  # Schedule the next sun drop
-
-            # Spawn zombies only after 18 seconds have passed
-            if game.get_game_time() > 18:
-                if random.randint(1, 10) > 8:  # 20% chance to spawn a zombie each second
-                    # Choose a zombie weighted by lower health
-                    zombie = weighted_random_zombie_choice(zombies)
-                    lane = random.randint(0, game.lanes - 1)
-                    if can_spawn_zombie_in_lane(game, lane):
-                        spawn_zombie(game, name=zombie.name, hp=zombie.hp, dmg=zombie.dmg,
-                                     walk_speed=zombie.walk_speed, extra_health=zombie.extra_health)
-                    else:
-                        print(f"Lane {lane + 1} is full and cannot spawn more zombies.")
-
-            # Move zombies
-            move_zombies(game)
-
-            # Generate sun from Sunflower and update the game state
-            update_sun_production(game)
-
-            # Check for lawnmower activation or game over
-            for lane in range(game.lanes):
-                if isinstance(game.field_objects[lane][1], Zombie):  # Check if a zombie is in col1
-                    if lawnmowers[lane]:
-                        activate_lawnmower(game, lane, lawnmowers)
-                        game.field_objects[lane][1] = None  # Remove the zombie in col1 after lawnmower activation
-                    else:
-                        raise GameOverException(
-                            f"Game Over! A zombie reached the lawnmower column (col1) in lane {lane + 1} and no lawnmower is available.")
-
-                elif isinstance(game.field_objects[lane][0], Zombie):  # Check if a zombie is in col0 (home)
-                    raise GameOverException(f"Game Over! A zombie reached the home column in lane {lane + 1}.")
-
-            # Print game status every second
-            print(f"Time: {game.get_game_time()} seconds")
-            print(f"Current sun: {game.sun}")
-            print_field(game)
-            elapsed_time += 1
-
-    except GameOverException as e:
-        print(e)
+    # Check the whole script before the clock starts rather than when a bad move comes due
+    script = None
+    if args.script:
+        try:
+            script = load_script(game, args.script, plants)
+        except ValueError as e:
+            print(f"Invalid script: {e}")
+            return
+
+    # Display initial field; a scripted game is headless and only shows the final result
+    if script is None:
+        print("Initial Game Field:")
+        print_field(game)
+
+    async def run_game():
+        # The clock owns asyncio primitives, so it is created inside the running loop
+        clock = GameClock(game, zombies, speed=args.speed, duration=args.duration, quiet=script is not None)
+        if script is not None:
+            player = scripted_player(clock, plants, script)
+        else:
+            player = human_player(clock, plants)
+        await play(clock, player)
+
+    asyncio.run(run_game())
 
     # Final display of the game field and sun points
     print("Final Game Field:")
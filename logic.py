@@ -136,15 +136,17 @@ def place_plant(game: Game, lane: int, col: int, plant: Plant) -> bool:
 
 
 # Function to buy and place a plant
-def buy_and_place(game: Game, lane: int, col: int, plant: Plant):
+def buy_and_place(game: Game, lane: int, col: int, plant: Plant) -> bool:
     if afford_check(game.sun, plant):
         if place_plant(game, lane, col, plant):
             game.sun -= plant.cost
             print(f'Remaining Sun: {game.sun}')
+            return True
         else:
             print('Failed to place plant.')
     else:
         print('Not enough sun to buy the plant.')
+    return False
 
 
 # Function to spawn a zombie in a random lane
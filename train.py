@@ -1,28 +1,16 @@
 import numpy as np
 from agent import DQNAgent
 from environment import PvZEnv
-from dbops import create_connection, get_all_plants, get_all_zombies, close_connection
+from dbops import load_plants_and_zombies
 from logic import *
 
 def main():
     # Load plants and zombies data from the database
-    conn = create_connection()
-    plants_data = get_all_plants(conn)
-    zombies_data = get_all_zombies(conn)
-    close_connection(conn)
-
-    # Create a dictionary to store Plant and Zombie objects by name
-    plants = {}
-    zombies = {}
-
-    for plant_data in plants_data:
-        plant_id, name, hp, dmg, dps, fire_rate, cost, cd = plant_data
-        sun_production = 25 if name == 'Sunflower' else 0
-        plants[name] = Plant(name=name, hp=hp, dmg=dmg, dps=dps, fire_rate=fire_rate, cost=cost, cd=cd, sun_production=sun_production)
-
-    for zombie_data in zombies_data:
-        zombie_id, name, hp, dmg, walk_speed, extra_health, *rest = zombie_data
-        zombies[name] = Zombie(name=name, hp=hp, dmg=dmg, walk_speed=walk_speed, extra_health=extra_health, lane=0, start_col=10)
+    try:
+        plants, zombies = load_plants_and_zombies()
+    except ConnectionError as e:
+        print(f"{e}. Exiting...")
+        return
 
     # Initialize the environment and the agent
     env = PvZEnv(plants, zombies)